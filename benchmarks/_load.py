@@ -0,0 +1,19 @@
+"""按文件路径加载插件内不依赖 Bot 运行环境的模块，避免触发 zhipu_toolkit/__init__"""
+
+import importlib.util
+from pathlib import Path
+import sys
+from types import ModuleType
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent / "zhipu_toolkit"
+
+
+def load(name: str) -> ModuleType:
+    spec = importlib.util.spec_from_file_location(
+        f"_zhipu_toolkit_{name}", PACKAGE_DIR / f"{name}.py"
+    )
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,49 @@
+"""
+昵称触发匹配微基准。
+
+对比 is_to_me 旧实现(逐个昵称做子串查找)与预编译正则的耗时。
+
+用法: python benchmarks/bench_nickname.py [--aliases N] [--number N]
+"""
+
+import argparse
+import timeit
+
+from _load import load
+
+nickname = load("nickname")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--aliases", type=int, default=50)
+    parser.add_argument("--number", type=int, default=100_000)
+    args = parser.parse_args()
+
+    names = [f"alias{i}" for i in range(args.aliases)] + ["真寻", "bot"]
+    messages = {
+        "miss": "今天天气不错我们去哪里玩呢" * 5,
+        "hit_tail": "今天天气不错我们去哪里玩呢" * 5 + "真寻",
+        "near_miss": "今天天气不错我们去哪里玩呢" * 5 + "robot",
+    }
+    for word_boundary in (False, True):
+        matcher = nickname.compile_nickname_matcher(names, word_boundary)
+        for label, msg in messages.items():
+            loop = timeit.timeit(
+                lambda msg=msg: any(n in msg for n in names), number=args.number
+            )
+            regex = timeit.timeit(lambda msg=msg: matcher(msg), number=args.number)
+            print(
+                f"boundary={word_boundary!s:<5} {label:<9} "
+                f"loop {loop / args.number * 1e6:6.2f}us  "
+                f"regex {regex / args.number * 1e6:6.2f}us  "
+                f"x{loop / regex:.1f}"
+            )
+    compile_time = timeit.timeit(
+        lambda: nickname.compile_nickname_matcher(names, True), number=100
+    )
+    print(f"compile {compile_time / 100 * 1e6:.1f}us ({len(names)} nicknames)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+插件启动耗时测量。
+
+- zhipuai SDK 的导入耗时，即延迟导入后从启动路径上省下的时间。
+- 插件导入耗时，以及导入后 zhipuai 是否已被加载(需在 Bot 环境中运行)。
+- 不同规模 chat_history.json 的解析耗时，即后台加载后不再阻塞启动的时间。
+- 保存时在事件循环中复制消息列表的耗时，与移到线程中的序列化耗时。
+
+用法: 在 Bot 根目录执行
+    python path/to/benchmarks/bench_startup.py [--module zhipu_toolkit]
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+import tempfile
+import time
+
+import ujson
+
+IMPORT_SDK = """
+import time
+start = time.perf_counter()
+import zhipuai
+print(time.perf_counter() - start)
+"""
+
+IMPORT_PLUGIN = """
+import sys, time
+import nonebot
+nonebot.init()
+start = time.perf_counter()
+nonebot.load_plugin({module!r})
+print(time.perf_counter() - start, "zhipuai" in sys.modules)
+"""
+
+
+def run(code: str) -> str | None:
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, cwd=os.getcwd()
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip().splitlines()[-1]
+
+
+def bench_history(conversations: int, messages: int) -> None:
+    content = "[发送于 2024-01-01 00:00:00 from 用户]:消息" * 3
+    data = {
+        str(uid): [{"role": "user", "content": content} for _ in range(messages)]
+        for uid in range(conversations)
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "chat_history.json"
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=4), "utf-8")
+        start = time.perf_counter()
+        ujson.loads(path.read_text("utf-8"))
+        elapsed = time.perf_counter() - start
+        size = path.stat().st_size / 1024 / 1024
+    start = time.perf_counter()
+    snapshot = {uid: list(values) for uid, values in data.items()}
+    copied = time.perf_counter() - start
+    start = time.perf_counter()
+    ujson.dumps(snapshot, ensure_ascii=False, indent=4)
+    dumped = time.perf_counter() - start
+    print(
+        f"history {conversations}x{messages}: {size:.1f} MiB, "
+        f"读取并解析 {elapsed * 1000:.1f} ms, "
+        f"保存时复制 {copied * 1000:.1f} ms / 序列化 {dumped * 1000:.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="zhipu_toolkit")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = [run(IMPORT_SDK) for _ in range(args.repeat)]
+    if None in samples:
+        print("zhipuai 未安装，跳过 SDK 导入测量")
+    else:
+        best = min(float(s) for s in samples if s is not None)
+        print(f"import zhipuai: {best * 1000:.1f} ms (best of {args.repeat})")
+
+    output = run(IMPORT_PLUGIN.format(module=args.module))
+    if output is None:
+        print(f"无法在当前环境加载插件 {args.module}，跳过插件导入测量")
+    else:
+        elapsed, loaded = output.split()
+        print(
+            f"load_plugin({args.module}): {float(elapsed) * 1000:.1f} ms, "
+            f"zhipuai 已导入: {loaded}"
+        )
+
+    for conversations, messages in ((100, 50), (1000, 100), (5000, 100)):
+        bench_history(conversations, messages)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""
+插件的部分模块不依赖 Bot 运行环境，测试与基准测试共用 benchmarks/_load.py
+按文件路径加载，避免触发 zhipu_toolkit/__init__。
+"""
+
+from pathlib import Path
+import sys
+from types import ModuleType
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from _load import load  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def store() -> ModuleType:
+    return load("store")
+
+
+@pytest.fixture(scope="session")
+def nickname() -> ModuleType:
+    return load("nickname")
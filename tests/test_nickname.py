@@ -0,0 +1,53 @@
+"""昵称触发匹配测试"""
+
+import random
+from types import ModuleType
+
+import pytest
+
+NICKNAMES = ["真寻", "bot", "小真寻a", "Zhenxun", "真寻a"]
+
+CASES = [
+    ("真寻ok吗", True),
+    ("hi真寻", True),
+    ("真寻2号", True),
+    ("hi bot", True),
+    ("bot!", True),
+    ("robot", False),
+    ("bots", False),
+    ("zhenxun", False),
+    ("Zhenxun_", False),
+    ("@Zhenxun 在吗", True),
+    ("真寻ab", True),
+    ("小真寻ab", True),
+    ("1真寻a", True),
+    ("真寻a1", True),
+    ("xbot bot", True),
+    ("今天天气不错", False),
+]
+
+
+@pytest.mark.parametrize(("text", "expected"), CASES)
+def test_word_boundary(nickname: ModuleType, text: str, expected: bool):
+    matcher = nickname.compile_nickname_matcher(NICKNAMES, True)
+    pattern = nickname.compile_nickname_pattern(NICKNAMES, True)
+    assert matcher(text) is expected
+    assert (pattern.search(text) is not None) is expected
+
+
+def test_without_word_boundary(nickname: ModuleType):
+    matcher = nickname.compile_nickname_matcher(NICKNAMES)
+    assert matcher("robot")
+    assert not matcher("今天天气不错")
+    assert not nickname.compile_nickname_matcher([])("bot")
+
+
+def test_matcher_agrees_with_pattern(nickname: ModuleType):
+    rng = random.Random(0)
+    names = ["ab", "abc", "b", "真寻", "寻a", "a真"]
+    alphabet = "abc1 真寻"
+    matcher = nickname.compile_nickname_matcher(names, True)
+    pattern = nickname.compile_nickname_pattern(names, True)
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8)))
+        assert matcher(text) is (pattern.search(text) is not None), text
@@ -0,0 +1,119 @@
+"""
+会话存储测试。
+
+RedisStore 使用 fakeredis 作为本地替身。
+"""
+
+import asyncio
+from types import ModuleType
+
+import pytest
+
+
+def make_stores(store: ModuleType, kind: str, count: int = 1) -> list:
+    """创建共享同一份数据的多个存储实例，模拟多个进程"""
+    if kind == "memory":
+        return [store.MemoryStore()] * count
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    return [
+        store.RedisStore(fakeredis.FakeAsyncRedis(server=server, decode_responses=True))
+        for _ in range(count)
+    ]
+
+
+KINDS = ["memory", "redis"]
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_append_trim_and_versions(store: ModuleType, kind: str):
+    async def main():
+        (s,) = make_stores(store, kind)
+        assert await s.get_versioned("k") == ([], 0)
+        assert await s.append("k", {"i": 0}) == 1
+        assert await s.append("k", {"i": 1}, {"i": 2}) == 2
+        assert await s.length_versioned("k") == (3, 2)
+        assert await s.get("k") == [{"i": 0}, {"i": 1}, {"i": 2}]
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_concurrent_append_trim_is_atomic(store: ModuleType, kind: str):
+    async def main():
+        stores = make_stores(store, kind, 4)
+        await asyncio.gather(
+            *(
+                stores[i % 4].append("ring", {"i": i}, maxlen=20)
+                for i in range(100)
+            )
+        )
+        items, version = await stores[0].get_versioned("ring")
+        assert version == 100
+        assert len(items) == 20
+        assert sorted(item["i"] for item in items) == list(range(80, 100))
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_compare_and_set(store: ModuleType, kind: str):
+    async def main():
+        a, b = make_stores(store, kind, 2)
+        _, version = await a.length_versioned("chat")
+        assert await a.compare_and_set("chat", [{"role": "system"}], version)
+        # 版本号已变化，另一个实例基于旧版本的写入必须失败
+        assert not await b.compare_and_set("chat", [{"role": "other"}], version)
+        assert await b.get_versioned("chat") == ([{"role": "system"}], version + 1)
+
+    asyncio.run(main())
+
+
+def test_redis_compare_and_set_loses_to_concurrent_write(store: ModuleType):
+    """WATCH 之后、EXEC 之前发生的写入应使 compare_and_set 失败"""
+
+    async def main():
+        a, b = make_stores(store, "redis", 2)
+        await a.append("chat", {"i": 0})
+        version = await a.version("chat")
+        pipeline = a.client.pipeline
+
+        def racing_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+
+            async def execute_after_write(*a_, **kw):
+                await b.append("chat", {"i": 1})
+                return await execute(*a_, **kw)
+
+            pipe.execute = execute_after_write
+            return pipe
+
+        a.client.pipeline = racing_pipeline
+        assert not await a.compare_and_set("chat", [], version)
+        a.client.pipeline = pipeline
+        assert await a.get("chat") == [{"i": 0}, {"i": 1}]
+        assert await a.version("chat") == version + 1
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_delete_and_clear(store: ModuleType, kind: str):
+    async def main():
+        (s,) = make_stores(store, kind)
+        await s.append("chat:1", {"i": 0}, {"i": 1})
+        await s.append("chat:2", {"i": 0})
+        await s.append("group_msg:1", {"i": 0})
+        version = await s.version("chat:1")
+        assert await s.delete("chat:1") == 2
+        assert await s.length_versioned("chat:1") == (0, version + 1)
+        assert await s.delete("chat:1") == 0
+        assert await s.version("chat:1") == version + 1
+        assert await s.delete("missing") == 0
+        assert await s.version("missing") == 0
+        assert await s.clear("chat:") == 1
+        assert await s.get("chat:2") == []
+        assert await s.get("group_msg:1") == [{"i": 0}]
+
+    asyncio.run(main())
@@ -38,6 +38,7 @@ __plugin_meta__ = PluginMetadata(
         格式:
             清理全部会话: 清理Bot缓存的全部会话记录
             启用/禁用伪人模式 群号: 开启或关闭指定群聊的伪人模式，空格是可选的
+            伪人统计: 查看各群的消息速率与伪人触发情况
         """,
         configs=[
             RegisterConfig(
@@ -112,6 +113,138 @@ __plugin_meta__ = PluginMetadata(
                 help="禁用伪人模式的群组列表",
                 default_value=[],
             ),
+            RegisterConfig(
+                key="NICKNAME_WORD_BOUNDARY",
+                value=False,
+                help="昵称触发是否要求英文单词边界，开启后`bot`不会匹配`robot`",
+                default_value=False,
+            ),
+            RegisterConfig(
+                key="REPLY_SEND_MODE",
+                value="split",
+                help="回复发送模式，支持'split'(逐句发送，会话繁忙时自动合并),'merge'(合并为一条消息),'forward'(合并转发)",  # noqa: E501
+                default_value="split",
+            ),
+            RegisterConfig(
+                key="AUTOSAVE_INTERVAL",
+                value=300,
+                help="对话数据自动保存间隔(秒)，无变化时跳过，为0则不自动保存",
+                default_value=300,
+            ),
+            RegisterConfig(
+                key="SHUTDOWN_DRAIN_TIMEOUT",
+                value=10,
+                help="关闭时等待进行中任务完成的最长时间(秒)",
+                default_value=10,
+            ),
+            RegisterConfig(
+                key="ASYNC_LOG",
+                value=False,
+                help="是否由后台线程异步写出对话日志，队列满时丢弃",
+                default_value=False,
+            ),
+            RegisterConfig(
+                key="LOG_MAX_LENGTH",
+                value=0,
+                help="日志中问题与回答的最大长度，超出部分截断，为0则不截断",
+                default_value=0,
+            ),
+            RegisterConfig(
+                key="LOG_SAMPLE_RATE",
+                value=1,
+                help="重复事件(缓存消息、伪人跳过等)的日志采样率，每N条记录1条",
+                default_value=1,
+            ),
+            RegisterConfig(
+                key="SESSION_STORE",
+                value="memory",
+                help="会话存储，支持'memory','redis'，多进程/多实例部署时使用redis共享会话",
+                default_value="memory",
+            ),
+            RegisterConfig(
+                key="REDIS_URL",
+                value="redis://localhost:6379/0",
+                help="SESSION_STORE为redis时使用的Redis地址",
+                default_value="redis://localhost:6379/0",
+            ),
+            RegisterConfig(
+                key="CHAT_MERGE_WINDOW",
+                value=0,
+                help="共享会话的提问合并窗口(秒)，窗口内的多条提问合并为一次回复，为0则不合并",
+                default_value=0,
+            ),
+            RegisterConfig(
+                key="IMAGE_BATCH_WINDOW",
+                value=0,
+                help="图片理解请求的合并窗口(毫秒)，窗口内的多张图片合并为一次请求，为0则不合并",
+                default_value=0,
+            ),
+            RegisterConfig(
+                key="IMAGE_BATCH_SIZE",
+                value=4,
+                help="单次合并请求的最大图片数量",
+                default_value=4,
+            ),
+            RegisterConfig(
+                key="RESPONSE_CACHE",
+                value=False,
+                help="是否启用短问题回复缓存",
+                default_value=False,
+            ),
+            RegisterConfig(
+                key="RESPONSE_CACHE_MAX_LENGTH",
+                value=20,
+                help="可缓存问题的最大长度",
+                default_value=20,
+            ),
+            RegisterConfig(
+                key="RESPONSE_CACHE_MAX_HISTORY",
+                value=0,
+                help="会话已有的对话条数不超过该值时才使用回复缓存，为0则只用于新会话的首个提问",
+                default_value=0,
+            ),
+            RegisterConfig(
+                key="RESPONSE_CACHE_TTL",
+                value=3600,
+                help="缓存回复的有效期(秒)",
+                default_value=3600,
+            ),
+            RegisterConfig(
+                key="RESPONSE_CACHE_MAX_REUSE",
+                value=3,
+                help="每条缓存回复的最大复用次数，用完后重新请求以保持回复多样",
+                default_value=3,
+            ),
+            RegisterConfig(
+                key="RESPONSE_CACHE_SIMILARITY",
+                value=0.6,
+                help="相似问题命中缓存所需的最低相似度[0-1]，0.6可使两字问题多一个字时命中",
+                default_value=0.6,
+            ),
+            RegisterConfig(
+                key="IMPERSONATION_ADAPTIVE",
+                value=False,
+                help="是否根据群消息速率自动调整伪人模式触发概率，开启后IMPERSONATION_TRIGGER_FREQUENCY不再生效",
+                default_value=False,
+            ),
+            RegisterConfig(
+                key="IMPERSONATION_TARGET",
+                value=3,
+                help="自适应模式下，每个群在一个统计窗口内的目标发言次数",
+                default_value=3,
+            ),
+            RegisterConfig(
+                key="IMPERSONATION_WINDOW",
+                value=600,
+                help="伪人模式统计窗口(秒)，须大于0",
+                default_value=600,
+            ),
+            RegisterConfig(
+                key="IMPERSONATION_GLOBAL_LIMIT",
+                value=0,
+                help="所有群在一个统计窗口内的伪人触发总数上限，为0则不限制",
+                default_value=0,
+            ),
         ],
     ).dict(),
 )
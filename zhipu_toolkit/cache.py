@@ -0,0 +1,180 @@
+from collections.abc import Iterable
+import re
+import time
+from typing import ClassVar
+
+from .config import ChatConfig
+
+
+class CacheEntry:
+    """缓存的回复"""
+
+    __slots__ = ("bands", "created", "grams", "reply", "uses")
+
+    def __init__(self, reply: str, grams: frozenset[str], bands: list[tuple]) -> None:
+        self.reply = reply
+        self.grams = grams
+        self.bands = bands
+        self.created = time.monotonic()
+        self.uses = 0
+
+
+class ResponseCache:
+    """
+    短问题回复缓存。
+
+    按 (模型, 人格) 隔离，先精确匹配归一化后的问题，
+    未命中时通过字符 n-gram 的 MinHash 分段索引查找相似问题，
+    并以 Jaccard 相似度校验。n-gram 同时包含单字与双字片段，
+    使短问题多一个字(如 `早安`/`早安啊`)时仍有 0.6 的相似度。缓存按 `RESPONSE_CACHE_TTL` 过期，
+    每条回复最多复用 `RESPONSE_CACHE_MAX_REUSE` 次，以保持回复的多样性。
+    回复来自带有提问者昵称与对话历史的请求，提及提问者的回复不会被缓存。
+    """
+
+    NGRAM = 2
+    """n-gram 的最大长度，取 1 至 NGRAM 字的片段"""
+    BANDS = 8
+    ROWS = 2
+    MAX_ENTRIES = 1024
+    STRIP_PATTERN = re.compile(r"[\s。，,.!！?？~～…]+")
+
+    entries: ClassVar[dict[tuple[str, str, str], CacheEntry]] = {}
+    buckets: ClassVar[dict[tuple, set[str]]] = {}
+    stats: ClassVar[dict[str, int]] = {"exact": 0, "similar": 0, "miss": 0}
+    """命中统计"""
+
+    @classmethod
+    def normalize(cls, text: str) -> str:
+        return cls.STRIP_PATTERN.sub("", text).lower()
+
+    @classmethod
+    def grams(cls, text: str) -> frozenset[str]:
+        """
+        取文本中 1 至 `NGRAM` 字的片段，重复的片段按出现次数区分，
+        使 `抱抱` 与 `抱抱我` 这类叠字问题的相似度不被低估。
+        """
+        if not text:
+            return frozenset([text])
+        counts: dict[str, int] = {}
+        for n in range(1, cls.NGRAM + 1):
+            for i in range(len(text) - n + 1):
+                gram = text[i : i + n]
+                counts[gram] = counts.get(gram, 0) + 1
+        return frozenset(
+            f"{gram}#{i}" for gram, count in counts.items() for i in range(count)
+        )
+
+    @classmethod
+    def signature(cls, grams: frozenset[str]) -> list[tuple]:
+        """计算 MinHash 签名并按段切分"""
+        sig = [
+            min(hash((seed, g)) for g in grams)
+            for seed in range(cls.BANDS * cls.ROWS)
+        ]
+        return [
+            (band, tuple(sig[band * cls.ROWS : (band + 1) * cls.ROWS]))
+            for band in range(cls.BANDS)
+        ]
+
+    @classmethod
+    def hit_rate(cls) -> float:
+        total = sum(cls.stats.values())
+        return (cls.stats["exact"] + cls.stats["similar"]) / total if total else 0.0
+
+    @classmethod
+    def acceptable(cls, text: str) -> bool:
+        """是否为可缓存的短问题"""
+        if ChatConfig.get("RESPONSE_CACHE") is not True:
+            return False
+        length = len(cls.normalize(text))
+        return 0 < length <= ChatConfig.get("RESPONSE_CACHE_MAX_LENGTH")
+
+    @classmethod
+    def __remove(cls, key: tuple[str, str, str]) -> None:
+        entry = cls.entries.pop(key)
+        for band in entry.bands:
+            bucket = cls.buckets.get((*key[:2], *band))
+            if bucket is not None:
+                bucket.discard(key[2])
+                if not bucket:
+                    del cls.buckets[(*key[:2], *band)]
+
+    @classmethod
+    def __take(cls, key: tuple[str, str, str]) -> str | None:
+        entry = cls.entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created > ChatConfig.get("RESPONSE_CACHE_TTL"):
+            cls.__remove(key)
+            return None
+        entry.uses += 1
+        if entry.uses >= ChatConfig.get("RESPONSE_CACHE_MAX_REUSE"):
+            cls.__remove(key)
+        return entry.reply
+
+    @classmethod
+    def get(cls, model: str, soul: str, text: str) -> str | None:
+        """
+        查找缓存的回复。
+
+        参数:
+        - model: 对话模型。
+        - soul: 人格。
+        - text: 用户问题。
+
+        返回:
+        - 命中的回复，未命中时返回 None。
+        """
+        norm = cls.normalize(text)
+        if (reply := cls.__take((model, soul, norm))) is not None:
+            cls.stats["exact"] += 1
+            return reply
+
+        grams = cls.grams(norm)
+        candidates: set[str] = set()
+        for band in cls.signature(grams):
+            candidates |= cls.buckets.get((model, soul, *band), set())
+        threshold = ChatConfig.get("RESPONSE_CACHE_SIMILARITY")
+        best, best_score = None, 0.0
+        for candidate in candidates:
+            entry = cls.entries.get((model, soul, candidate))
+            if entry is None:
+                continue
+            score = len(grams & entry.grams) / len(grams | entry.grams)
+            if score >= threshold and score > best_score:
+                best, best_score = candidate, score
+        if best is not None and (
+            (reply := cls.__take((model, soul, best))) is not None
+        ):
+            cls.stats["similar"] += 1
+            return reply
+        cls.stats["miss"] += 1
+        return None
+
+    @classmethod
+    def put(
+        cls, model: str, soul: str, text: str, reply: str, private: Iterable[str] = ()
+    ) -> None:
+        """
+        缓存回复，已有同一问题的缓存时不覆盖。
+
+        参数:
+        - model: 对话模型。
+        - soul: 人格。
+        - text: 用户问题。
+        - reply: 回复。
+        - private: 提问者的昵称等个人信息，回复中包含任一项时不缓存。
+        """
+        if any(item and item in reply for item in private):
+            return
+        norm = cls.normalize(text)
+        key = (model, soul, norm)
+        if key in cls.entries:
+            return
+        if len(cls.entries) >= cls.MAX_ENTRIES:
+            cls.__remove(next(iter(cls.entries)))
+        grams = cls.grams(norm)
+        bands = cls.signature(grams)
+        cls.entries[key] = CacheEntry(reply, grams, bands)
+        for band in bands:
+            cls.buckets.setdefault((model, soul, *band), set()).add(norm)
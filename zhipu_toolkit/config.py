@@ -19,7 +19,29 @@ class ChatConfig:
         "IMPERSONATION_TRIGGER_FREQUENCY": 20,
         "IMPERSONATION_MODEL": "glm-4-flash",
         "IMPERSONATION_SOUL": False,
-        "IMPERSONATION_BAN_GROUP": []
+        "IMPERSONATION_BAN_GROUP": [],
+        "NICKNAME_WORD_BOUNDARY": False,
+        "REPLY_SEND_MODE": "split",
+        "AUTOSAVE_INTERVAL": 300,
+        "SHUTDOWN_DRAIN_TIMEOUT": 10,
+        "ASYNC_LOG": False,
+        "LOG_MAX_LENGTH": 0,
+        "LOG_SAMPLE_RATE": 1,
+        "SESSION_STORE": "memory",
+        "REDIS_URL": "redis://localhost:6379/0",
+        "CHAT_MERGE_WINDOW": 0,
+        "IMAGE_BATCH_WINDOW": 0,
+        "IMAGE_BATCH_SIZE": 4,
+        "RESPONSE_CACHE": False,
+        "RESPONSE_CACHE_MAX_LENGTH": 20,
+        "RESPONSE_CACHE_MAX_HISTORY": 0,
+        "RESPONSE_CACHE_TTL": 3600,
+        "RESPONSE_CACHE_MAX_REUSE": 3,
+        "RESPONSE_CACHE_SIMILARITY": 0.6,
+        "IMPERSONATION_ADAPTIVE": False,
+        "IMPERSONATION_TARGET": 3,
+        "IMPERSONATION_WINDOW": 600,
+        "IMPERSONATION_GLOBAL_LIMIT": 0,
     }
 
     @classmethod
@@ -36,8 +58,6 @@ plugin_config: PluginConfig = PluginConfig.parse_obj(
     nonebot.get_driver().config.dict(exclude_unset=True)
 )
 
-nicknames = plugin_config.nickname
-
 
 class GroupMessageModel(BaseModel):
     """
@@ -1,18 +1,33 @@
 import asyncio
+from collections import deque
+from collections.abc import Iterable, Iterator
 import datetime
+from functools import lru_cache
+import math
 import os
 from pathlib import Path
 import random
 import re
-from typing import ClassVar
+import shutil
+import time
+from typing import TYPE_CHECKING, ClassVar
 import uuid
+import weakref
 
 import aiofiles
 from nonebot.adapters import Bot
-from nonebot_plugin_alconna import At, Image, Text, UniMsg, Video
+from nonebot_plugin_alconna import (
+    At,
+    CustomNode,
+    Image,
+    Reference,
+    Text,
+    UniMessage,
+    UniMsg,
+    Video,
+)
 from nonebot_plugin_uninfo import Session
 import ujson
-from zhipuai import ZhipuAI
 
 from zhenxun.configs.config import BotConfig, Config
 from zhenxun.configs.path_config import DATA_PATH, IMAGE_PATH
@@ -20,35 +35,153 @@ from zhenxun.models.ban_console import BanConsole
 from zhenxun.services.log import logger
 from zhenxun.utils.rules import ensure_group
 
+from .cache import ResponseCache
 from .config import ChatConfig, GroupMessageModel
+from .log import ChatLog
+from .store import MemoryStore, SessionStore, create_store
 
-GROUP_MSG_CACHE: dict[str, list[GroupMessageModel]] = {}
+if TYPE_CHECKING:
+    from zhipuai import ZhipuAI
 
+GROUP_MSG_MAXLEN = 20
+"""每个群缓存的最大消息数"""
 
-async def __split_text(text: str, pattern: str, maxsplit: int) -> list[str]:
-    """辅助函数，用于分割文本"""
-    return re.split(pattern, text, maxsplit)
 
+@lru_cache(maxsize=4)
+def __create_client(api_key: str) -> "ZhipuAI":
+    from zhipuai import ZhipuAI
 
-async def split_text(text: str) -> list[tuple[list, float]]:
-    """文本切割"""
-    results = []
-    split_list = [
-        s for s in await __split_text(text, r"(?<!\?)[。？！\n](?!\?)", 3) if s.strip()
-    ]
-    for r in split_list:
-        next_char_index = text.find(r) + len(r)
-        if next_char_index < len(text) and text[next_char_index] == "？":
-            r += "？"
-        results.append((await parse_at(r), min(len(r) * 0.2, 3.0)))
-    return results
+    return ZhipuAI(api_key=api_key)
+
+
+def get_zhipu_client() -> "ZhipuAI":
+    """
+    获取ZhipuAI客户端。
+
+    zhipuai SDK 及其依赖在首次调用时才导入，客户端按APIKEY复用。
+    """
+    return __create_client(ChatConfig.get("API_KEY"))
+
+
+SPLIT_PATTERN = re.compile(r"@(\d+)|(?<!\?)([。？！\n])(?!\?)")
+"""分句与 @ 解析共用的正则"""
+
+
+def split_text(text: str, maxsplit: int = 3) -> Iterator[tuple[list, float]]:
+    """
+    文本切割。
+
+    单次扫描文本，同时完成分句与 `@` 解析，惰性产出每句的消息段及发送后的延迟。
+
+    参数:
+    - text: 待切割的文本。
+    - maxsplit: 最大分句次数，超出部分作为最后一句整体发送。
+
+    返回:
+    - (消息段列表, 延迟秒数) 的迭代器。
+    """
+    segments: list = []
+    chunk_start = buf_start = 0
+    splits = 0
+    for match in SPLIT_PATTERN.finditer(text):
+        if uid := match.group(1):
+            if match.start() > buf_start:
+                segments.append(Text(text[buf_start : match.start()]))
+            segments.append(At("user", uid))
+            buf_start = match.end()
+            continue
+        if splits >= maxsplit:
+            continue
+        splits += 1
+        raw = text[chunk_start : match.start()]
+        tail = text[buf_start : match.start()]
+        if raw.strip():
+            if match.group(2) == "？":
+                raw += "？"
+                tail += "？"
+            if tail:
+                segments.append(Text(tail))
+            yield segments, min(len(raw) * 0.2, 3.0)
+        segments = []
+        chunk_start = buf_start = match.end()
+    raw = text[chunk_start:]
+    if tail := text[buf_start:].removesuffix("。"):
+        segments.append(Text(tail))
+    if raw.strip():
+        yield segments, min(len(raw) * 0.2, 3.0)
+
+
+class ReplySender:
+    """
+    回复发送器。
+
+    根据 `REPLY_SEND_MODE` 逐句发送、合并为一条消息或合并转发。
+    逐句模式下，若同一会话已有回复正在发送，则本次回复自动合并为一条消息，
+    以减少协议端的 API 调用与风控压力。
+    """
+
+    sending: ClassVar[dict[str, int]] = {}
+    """各会话正在发送中的回复数量"""
+
+    @classmethod
+    def merge(cls, chunks: Iterable[tuple[list, float]]) -> list:
+        """将分句结果合并为一组消息段，句间以换行分隔"""
+        merged = []
+        for segments, _ in chunks:
+            if merged:
+                merged.append(Text("\n"))
+            merged.extend(segments)
+        return merged
+
+    @classmethod
+    async def send(cls, text: str, session: Session) -> None:
+        """
+        在当前事件上下文中发送回复。
+
+        参数:
+        - text: 回复文本。
+        - session: 当前会话。
+        """
+        mode = ChatConfig.get("REPLY_SEND_MODE")
+        scene_id = session.scene.id
+        busy = cls.sending.get(scene_id, 0) > 0
+        cls.sending[scene_id] = cls.sending.get(scene_id, 0) + 1
+        try:
+            if mode == "forward" or mode == "merge" or busy:
+                # 回复只含标点等内容时分句结果为空，与逐句模式一样不发送
+                if not (merged := cls.merge(split_text(text))):
+                    return
+                if mode == "forward":
+                    await UniMessage(
+                        Reference(
+                            nodes=[
+                                CustomNode(
+                                    uid=session.self_id,
+                                    name=BotConfig.self_nickname,
+                                    content=UniMessage(merged),
+                                )
+                            ]
+                        )
+                    ).send()
+                else:
+                    await UniMessage(merged).send()
+            else:
+                delay = 0.0
+                for segments, next_delay in split_text(text):
+                    await asyncio.sleep(delay)
+                    await UniMessage(segments).send()
+                    delay = next_delay
+        finally:
+            cls.sending[scene_id] -= 1
+            if cls.sending[scene_id] <= 0:
+                del cls.sending[scene_id]
 
 
 async def cache_group_message(message: UniMsg, session: Session, self=None) -> None:
     """
     异步缓存群组消息函数。
 
-    该函数用于将接收到的群组消息缓存到内存中，以便后续处理。
+    该函数用于将接收到的群组消息缓存到会话存储的环形缓冲中，以便后续处理。
     如果self参数不为空，则表示消息来自机器人自身，否则消息来自其他用户。
     使用GroupMessageModel模型来封装消息信息。
 
@@ -74,41 +207,112 @@ async def cache_group_message(message: UniMsg, session: Session, self=None) -> N
         )
 
     gid = session.scene.id
-    logger.debug(f"GROUP {gid} 成功缓存聊天记录: {msg}", "zhipu_toolkit")
-    if gid in GROUP_MSG_CACHE:
-        if len(GROUP_MSG_CACHE[gid]) >= 20:
-            GROUP_MSG_CACHE[gid].pop(0)
-            logger.debug(f"GROUP {gid} 缓存已满，自动清理最早的记录", "zhipu_toolkit")
+    ChatLog.debug(lambda: f"GROUP {gid} 成功缓存聊天记录: {msg}", sample="cache")
+    version = await ChatManager.store.append(
+        ChatManager.GROUP_PREFIX + gid, msg.dict(), maxlen=GROUP_MSG_MAXLEN
+    )
+    if ImpersonationPrompt.of(gid).apply(msg, version):
+        ChatLog.debug(
+            lambda: f"GROUP {gid} 缓存已满，自动清理最早的记录", sample="evict"
+        )
 
-        GROUP_MSG_CACHE[gid].append(msg)
-    else:
-        GROUP_MSG_CACHE[gid] = [msg]
 
+class ImpersonationPrompt:
+    """
+    伪人模式提示词构建器。
 
-async def parse_at(message: str) -> list:
+    每个群维护一份随缓存消息增删而增量更新的聊天记录文本，
+    并记录对应的存储版本号；版本号不连续时(如其他进程写入)从存储重建。
+    静态要求与人格放在 system 消息中，保证前缀逐字节稳定以命中平台的上下文缓存；
+    随群变化的身份信息与聊天记录放在其后。
     """
-    将字符串消息转换为消息段列表。
 
-    该函数解析输入的字符串消息，将其中的 `@` 转换为对应的消息段，并将文本分割成每句话。
+    RULES = "你在一个QQ群里，请你结合该群的聊天记录作出回应，要求表现得随性一点，需要参与讨论，混入其中。不要过分插科打诨，不要提起无关的话题，不知道说什么可以复读群友的话。不允许包含聊天记录的格式。如果觉得此时不需要自己说话，请只回复`<EMPTY>`。"  # noqa: E501
+    FOOT = "\n\n你的回复应该尽可能简练,一次只说一句话，像人类一样随意，不允许有emoji。"  # noqa: E501
 
-    :param message: 输入的字符串消息。
-    :return: 包含消息段的列表，每个消息段为 MessageSegment 实例。
-    """
-    segments = []
-    message = message.removesuffix("。")
-    at_pattern = r"@(\d+)"
-    last_pos = 0
+    prompts: ClassVar[dict[str, "ImpersonationPrompt"]] = {}
 
-    for match in re.finditer(at_pattern, message, re.DOTALL):
-        if match.start() > last_pos:
-            segments.append(Text(message[last_pos : match.start()]))
-        uid = match.group(1)
-        segments.append(At("user", uid))
-        last_pos = match.end()
-    if last_pos < len(message):
-        segments.append(Text(message[last_pos:]))
+    def __init__(self) -> None:
+        self.pieces: deque[str] = deque()
+        self.transcript = ""
+        self.version = 0
+        """聊天记录对应的存储版本号"""
+        self.length = 0
+        """最近一次构建的提示词长度"""
 
-    return segments
+    @classmethod
+    def of(cls, gid: str) -> "ImpersonationPrompt":
+        """获取群组对应的构建器"""
+        if gid not in cls.prompts:
+            cls.prompts[gid] = cls()
+        return cls.prompts[gid]
+
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def system_prompt(soul: str) -> str:
+        return (
+            f"你需要遵循以下要求，同时保证回应中不包含聊天记录格式。{soul}\n\n"
+            f"{ImpersonationPrompt.RULES}"
+        )
+
+    @staticmethod
+    def render(msg: GroupMessageModel) -> str:
+        return f"{msg.nickname} ({msg.uid})说:\n{msg.msg}\n\n"
+
+    def apply(self, msg: GroupMessageModel, version: int) -> bool:
+        """
+        将本进程写入存储的消息增量应用到聊天记录。
+
+        参数:
+        - msg: 追加的消息。
+        - version: 追加后的存储版本号。
+
+        返回:
+        - 是否移除了最早的一条消息。
+        """
+        if version != self.version + 1:
+            self.version = -1
+            return False
+        self.version = version
+        evicted = len(self.pieces) >= GROUP_MSG_MAXLEN
+        if evicted:
+            self.transcript = self.transcript[len(self.pieces.popleft()) :]
+        piece = self.render(msg)
+        self.pieces.append(piece)
+        self.transcript += piece
+        return evicted
+
+    async def sync(self, gid: str) -> None:
+        """与存储中的版本不一致时，从存储重建聊天记录"""
+        key = ChatManager.GROUP_PREFIX + gid
+        if await ChatManager.store.version(key) == self.version:
+            return
+        items, self.version = await ChatManager.store.get_versioned(key)
+        self.pieces = deque(self.render(GroupMessageModel(**i)) for i in items)
+        self.transcript = "".join(self.pieces)
+
+    def build(self, self_id: str, name: str, soul: str) -> list[dict]:
+        """
+        构建伪人模式的对话消息。
+
+        参数:
+        - self_id: Bot的QQ号。
+        - name: Bot在群内的名字。
+        - soul: 伪人人格。
+
+        返回:
+        - 可直接提交给对话模型的消息列表。
+        """
+        system = self.system_prompt(soul)
+        user = (
+            f"你的QQ是`{self_id}`，你的名字是`{name}`。下面是群组的聊天记录：\n\n"
+            f"{self.transcript}{self.FOOT}"
+        )
+        self.length = len(system) + len(user)
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
 
 
 async def submit_task_to_zhipuai(message: str):
@@ -124,7 +328,7 @@ async def submit_task_to_zhipuai(message: str):
     返回:
     - 无
     """
-    client = ZhipuAI(api_key=ChatConfig.get("API_KEY"))
+    client = get_zhipu_client()
     return client.videos.generations(
         model=ChatConfig.get("VIDEO_MODEL"),
         prompt=message,
@@ -143,8 +347,36 @@ async def hello() -> list:
             "呼呼，叫俺干嘛",
         ]
     )
-    img = random.choice(os.listdir(IMAGE_PATH / "zai"))
-    return [result, IMAGE_PATH / "zai" / img]
+    return [result, GreetingImages.choice()]
+
+
+class GreetingImages:
+    """
+    打招呼图片索引。
+
+    启动时建立图片目录索引，之后仅在目录修改时间变化时重新扫描。
+    """
+
+    path: Path = IMAGE_PATH / "zai"
+    images: ClassVar[list[str]] = []
+    mtime: ClassVar[float | None] = None
+
+    @classmethod
+    def refresh(cls) -> None:
+        """目录有变化时重建索引"""
+        try:
+            mtime = os.stat(cls.path).st_mtime
+        except FileNotFoundError:
+            cls.images, cls.mtime = [], None
+            return
+        if mtime != cls.mtime:
+            cls.images = os.listdir(cls.path)
+            cls.mtime = mtime
+
+    @classmethod
+    def choice(cls) -> Path:
+        cls.refresh()
+        return cls.path / random.choice(cls.images)
 
 
 async def check_task_status_periodically(task_id: str, action) -> None:
@@ -186,23 +418,118 @@ async def check_task_status_from_zhipuai(task_id: str):
     返回:
     返回ZhipuAI的API调用结果，包含任务的详细处理状态信息。
     """
-    client = ZhipuAI(api_key=ChatConfig.get("API_KEY"))
+    client = get_zhipu_client()
     return client.videos.retrieve_videos_result(id=task_id)
 
 
+class ChatBurst:
+    """合并窗口内同一会话的多条提问"""
+
+    def __init__(self) -> None:
+        self.words: list[str] = []
+        self.askers: list[str] = []
+
+    def add(self, words: str, asker: str) -> None:
+        self.words.append(words)
+        if asker not in self.askers:
+            self.askers.append(asker)
+
+
 class ChatManager:
-    chat_history: ClassVar[dict] = {}
+    store: ClassVar[SessionStore] = MemoryStore()
+    """会话存储，保存对话历史与群消息缓存"""
+    CHAT_PREFIX = "chat:"
+    GROUP_PREFIX = "group_msg:"
     DATA_FILE_PATH: Path = DATA_PATH / "zhipu_toolkit"
     chat_history_token: ClassVar[dict] = {}
     impersonation_group: ClassVar[dict] = {}
+    dirty: ClassVar[bool] = False
+    """对话数据自上次保存后是否有变化"""
+    save_disabled: ClassVar[bool] = False
+    """加载对话数据失败时为True，避免覆盖原文件"""
+    locks: ClassVar[weakref.WeakValueDictionary[str, asyncio.Lock]] = (
+        weakref.WeakValueDictionary()
+    )
+    """各会话的顺序锁，无人持有或等待时自动释放"""
+    bursts: ClassVar[dict[tuple[str, str], "ChatBurst"]] = {}
+    """各会话合并窗口内的提问，按 (会话ID, 场景ID) 区分"""
+    _loaded: ClassVar[asyncio.Event | None] = None
+    _save_lock: ClassVar[asyncio.Lock] = asyncio.Lock()
+    _load_task: ClassVar[asyncio.Task | None] = None
 
     @classmethod
     async def initialize(cls) -> None:
         """
         初始化变量
+
+        对话数据在后台加载，不阻塞Bot启动；读写对话数据前需等待加载完成。
         """
         os.makedirs(cls.DATA_FILE_PATH, exist_ok=True)
-        cls.chat_history = await cls.load_data()
+        GreetingImages.refresh()
+        cls.store = create_store(
+            ChatConfig.get("SESSION_STORE"), ChatConfig.get("REDIS_URL")
+        )
+        cls._loaded = asyncio.Event()
+        cls._load_task = asyncio.create_task(cls.__load_in_background())
+
+    @classmethod
+    async def __load_in_background(cls) -> None:
+        assert cls._loaded is not None
+        try:
+            if isinstance(cls.store, MemoryStore):
+                cls.store.load(cls.CHAT_PREFIX, await cls.load_data())
+            else:
+                await cls.__import_to_store()
+        except Exception as e:
+            # 不能让内存中几乎为空的数据覆盖原文件
+            cls.save_disabled = True
+            path = cls.DATA_FILE_PATH / "chat_history.json"
+            backup = path.with_name(
+                f"chat_history.{datetime.datetime.now():%Y%m%d%H%M%S}.bak.json"
+            )
+            try:
+                shutil.copy2(path, backup)
+            except OSError:
+                backup = path
+            logger.error(
+                f"加载对话数据失败，已停止保存对话数据，原文件保留在 {backup}",
+                "zhipu_toolkit",
+                e=e,
+            )
+        finally:
+            cls._loaded.set()
+
+    @classmethod
+    async def __import_to_store(cls) -> None:
+        """
+        将 chat_history.json 导入自身持久化的会话存储(如 Redis)
+
+        只写入从未存在过的会话，多个实例同时导入或导入中断后重试都不会覆盖已有会话。
+        导入完成后原文件重命名为 chat_history.imported.json，不再重复导入。
+        """
+        path = cls.DATA_FILE_PATH / "chat_history.json"
+        if not path.exists():
+            return
+        data = await cls.load_data()
+        count = 0
+        for uid, messages in data.items():
+            if await cls.store.compare_and_set(cls.CHAT_PREFIX + uid, messages, 0):
+                count += 1
+        imported = path.with_name("chat_history.imported.json")
+        os.replace(path, imported)
+        logger.info(
+            f"已将 {count}/{len(data)} 个会话从 {path.name} 导入会话存储，"
+            f"原文件已重命名为 {imported.name}",
+            "zhipu_toolkit",
+        )
+
+    @classmethod
+    async def wait_loaded(cls) -> None:
+        """
+        等待对话数据加载完成，未初始化时直接返回
+        """
+        if cls._loaded is not None:
+            await cls._loaded.wait()
 
     @classmethod
     async def load_data(cls) -> dict:
@@ -215,21 +542,59 @@ class ChatManager:
         async with aiofiles.open(
             cls.DATA_FILE_PATH / "chat_history.json", encoding="utf-8"
         ) as file:
-            data = ujson.loads(await file.read())
+            raw = await file.read()
 
-        return data
+        return await asyncio.to_thread(ujson.loads, raw)
 
     @classmethod
-    async def save(cls) -> None:
+    async def save(cls, only_dirty: bool = False) -> bool:
         """
         将对话数据保存到 JSON 文件中。
+
+        先写入临时文件再替换，避免中途退出导致文件损坏；同一时间只有一次保存。
+        事件循环中只复制各会话的消息列表，序列化与写文件在线程中进行。
+        会话存储自身持久化(如 Redis)或启动时加载失败时不写文件。
+
+        参数:
+        - only_dirty: 为True时，对话数据无变化则跳过保存。
+
+        返回:
+        - 是否执行了保存。
         """
-        async with aiofiles.open(
-            cls.DATA_FILE_PATH / "chat_history.json", mode="w", encoding="utf-8"
-        ) as file:
-            await file.write(
-                ujson.dumps(cls.chat_history, ensure_ascii=False, indent=4)
+        await cls.wait_loaded()
+        if cls.save_disabled or not isinstance(cls.store, MemoryStore):
+            return False
+        async with cls._save_lock:
+            if only_dirty and not cls.dirty:
+                return False
+            cls.dirty = False
+            snapshot = {
+                uid: list(messages)
+                for uid, messages in cls.store.dump(cls.CHAT_PREFIX).items()
+            }
+            write = asyncio.ensure_future(
+                asyncio.to_thread(
+                    cls.__write_file, cls.DATA_FILE_PATH / "chat_history.json", snapshot
+                )
             )
+            try:
+                try:
+                    await asyncio.shield(write)
+                except asyncio.CancelledError:
+                    # 线程无法中断，写完后再释放锁，避免与下一次保存争用临时文件
+                    await write
+                    raise
+            except BaseException:
+                cls.dirty = True
+                raise
+        return True
+
+    @staticmethod
+    def __write_file(path: Path, data: dict) -> None:
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, mode="w", encoding="utf-8") as file:
+            ujson.dump(data, file, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
 
     @classmethod
     async def check_token(cls, uid: str, token_len: int):
@@ -247,84 +612,200 @@ class ChatManager:
         # cls.chat_history[uid] = user_history
 
     @classmethod
-    async def normal_chat_result(cls, msg: UniMsg, session: Session) -> str:
-        match ChatConfig.get("CHAT_MODE"):
-            case "user":
-                uid = session.user.id
-            case "group":
-                uid = "g-" + (
-                    session.scene.id if ensure_group(session) else session.user.id
-                )
-            case "all":
-                uid = "mix_mode"
-            case _:
-                raise ValueError("CHAT_MODE must be 'user', 'group' or 'all'")
+    async def normal_chat_result(cls, msg: UniMsg, session: Session) -> str | None:
+        """
+        获取普通对话的回复。
+
+        `RESPONSE_CACHE` 开启时，纯文本短问题优先使用缓存的回复。为避免依赖上下文的
+        提问(如 `为什么`)串用其他会话的回复，只在会话已有的对话条数不超过
+        `RESPONSE_CACHE_MAX_HISTORY` 时使用和写入缓存。
+        同一会话内的提问按到达顺序串行处理。`CHAT_MERGE_WINDOW` 大于 0 且会话为
+        多人共享(`CHAT_MODE` 为 group 或 all)时，窗口内同一会话、同一场景的
+        多条提问合并为一次模型调用，回复会 @ 每位提问者。
+
+        返回:
+        - 回复内容；提问被合并到其他提问的回复中时返回 None。
+        """
+        uid = cls.get_chat_uid(session)
+        await cls.wait_loaded()
         nickname = await cls.get_user_nickname(session)
-        await cls.add_system_message(ChatConfig.get("SOUL"), uid)
         message = await cls.parse_msg(msg)
         words = f"[发送于 {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} from {nickname}]:{message}"
         if len(words) > 4095:
             logger.warning(
-                f"USER {uid} NICKNAME {nickname} 问题: {words} ---- 超出最大token限制: 4095",  # noqa: E501
+                f"USER {uid} NICKNAME {nickname} 问题: {ChatLog.truncate(words)} ---- 超出最大token限制: 4095",  # noqa: E501
                 "zhipu_toolkit",
                 session=session,
             )
             return "超出最大token限制: 4095"
+
+        model, soul = ChatConfig.get("CHAT_MODEL"), ChatConfig.get("SOUL")
+        if cacheable := (
+            all(isinstance(segment, Text) for segment in msg)
+            and ResponseCache.acceptable(message)
+            # 对话历史的首条为人格设定，不计入条数
+            and (await cls.store.length_versioned(cls.CHAT_PREFIX + uid))[0] - 1
+            <= ChatConfig.get("RESPONSE_CACHE_MAX_HISTORY")
+        ):
+            if (reply := ResponseCache.get(model, soul, message)) is not None:
+                async with cls.lock(uid):
+                    await cls.add_system_message(soul, uid)
+                    await cls.add_message(words, uid)
+                    await cls.add_message(reply, uid, role="assistant")
+                hit_rate = ResponseCache.hit_rate()
+                ChatLog.debug(
+                    lambda: f"USER {uid} 命中回复缓存，命中率: {hit_rate:.2%}",
+                    sample="response_cache",
+                )
+                return reply
+
+        window = ChatConfig.get("CHAT_MERGE_WINDOW")
+        if window <= 0 or ChatConfig.get("CHAT_MODE") == "user":
+            async with cls.lock(uid):
+                result = await cls.__chat(uid, words, nickname, session)
+            if cacheable and result[1]:
+                ResponseCache.put(
+                    model, soul, message, result[0], (nickname, session.user.id)
+                )
+            return result[0]
+
+        # CHAT_MODE 为 all 时各群共享会话，只合并同一场景的提问，
+        # 保证回复发往提问所在的群，且只 @ 该群的提问者
+        key = (uid, session.scene.id)
+        if (burst := cls.bursts.get(key)) is not None:
+            burst.add(words, session.user.id)
+            return None
+        burst = cls.bursts[key] = ChatBurst()
+        burst.add(words, session.user.id)
+        try:
+            await asyncio.sleep(window)
+        finally:
+            del cls.bursts[key]
+        async with cls.lock(uid):
+            # 合并多人的提问触发内容审查时无法确定提问者，不做封禁
+            result = await cls.__chat(
+                uid,
+                "\n".join(burst.words),
+                nickname,
+                session,
+                ban=len(burst.askers) == 1,
+            )
+        if len(burst.askers) > 1:
+            return "".join(f"@{asker} " for asker in burst.askers) + result[0]
+        if cacheable and result[1] and len(burst.words) == 1:
+            ResponseCache.put(
+                model, soul, message, result[0], (nickname, session.user.id)
+            )
+        return result[0]
+
+    @classmethod
+    def lock(cls, uid: str) -> asyncio.Lock:
+        """获取会话的顺序锁，不存在时创建"""
+        if (lock := cls.locks.get(uid)) is None:
+            lock = cls.locks[uid] = asyncio.Lock()
+        return lock
+
+    @classmethod
+    def get_chat_uid(cls, session: Session) -> str:
+        """根据 `CHAT_MODE` 获取会话ID"""
+        match ChatConfig.get("CHAT_MODE"):
+            case "user":
+                return session.user.id
+            case "group":
+                return "g-" + (
+                    session.scene.id if ensure_group(session) else session.user.id
+                )
+            case "all":
+                return "mix_mode"
+            case _:
+                raise ValueError("CHAT_MODE must be 'user', 'group' or 'all'")
+
+    @classmethod
+    async def __chat(
+        cls, uid: str, words: str, nickname: str, session: Session, ban: bool = True
+    ) -> tuple[str, bool]:
+        """
+        向会话追加提问并获取回复，调用方需持有该会话的锁
+
+        参数:
+        - ban: 提问触发内容审查时是否封禁 `session` 中的用户。
+
+        返回:
+        - (回复内容, 是否正常回复)
+        """
+        await cls.add_system_message(ChatConfig.get("SOUL"), uid)
         await cls.add_message(words, uid)
         result = await cls.get_zhipu_result(
-            uid, ChatConfig.get("CHAT_MODEL"), cls.chat_history[uid], session
+            uid,
+            ChatConfig.get("CHAT_MODEL"),
+            await cls.store.get(cls.CHAT_PREFIX + uid),
+            session,
+            ban=ban,
         )
         if result[1] is False:
-            logger.info(
-                f"NICKNAME `{nickname}` 问题: {words} ---- 触发内容审查",
-                "zhipu_toolkit",
+            ChatLog.info(
+                lambda: f"NICKNAME `{nickname}` 问题: {ChatLog.truncate(words)} ---- 触发内容审查",  # noqa: E501
                 session=session,
             )
-            return result[0]
+            return result
         await cls.add_message(result[0], uid, role="assistant")
-        logger.info(
-            f"NICKNAME `{nickname}` 问题：{words} ---- 回答：{result[0]}",
-            "zhipu_toolkit",
+        answer = result[0]
+        ChatLog.info(
+            lambda: f"NICKNAME `{nickname}` 问题：{ChatLog.truncate(words)} ---- 回答：{ChatLog.truncate(answer)}",  # noqa: E501
             session=session,
         )
-        return result[0]
+        return result
 
     @classmethod
     async def add_message(cls, words: str, uid: str, role="user") -> None:
-        cls.chat_history[uid].append({"role": role, "content": words})
+        await cls.store.append(cls.CHAT_PREFIX + uid, {"role": role, "content": words})
+        cls.dirty = True
         await cls.check_token(uid, len(words))
 
     @classmethod
     async def add_system_message(cls, soul: str, uid: str) -> None:
-        if cls.chat_history.get(uid) is None:
-            cls.chat_history[uid] = [{"role": "system", "content": soul}]
+        key = cls.CHAT_PREFIX + uid
+        length, version = await cls.store.length_versioned(key)
+        # 并发创建时以先写入者为准
+        if length == 0 and await cls.store.compare_and_set(
+            key, [{"role": "system", "content": soul}], version
+        ):
+            cls.dirty = True
 
     @classmethod
     async def clear_history(cls, uid: str | None = None) -> int:
+        await cls.wait_loaded()
         if uid is None:
-            count = len(cls.chat_history)
-            cls.chat_history = {}
-        elif cls.chat_history.get(uid) is None:
-            count = 0
+            count = await cls.store.clear(cls.CHAT_PREFIX)
         else:
-            count = len(cls.chat_history[uid])
-            del cls.chat_history[uid]
+            count = await cls.store.delete(cls.CHAT_PREFIX + uid)
+        if count:
+            cls.dirty = True
         return count
 
     @classmethod
     async def parse_msg(cls, msg: UniMsg) -> str:
+        """将消息转为文本，消息中的图片并发获取描述"""
+        urls: list[str] = []
+        for segment in msg:
+            if isinstance(segment, Image):
+                assert segment.url is not None
+                urls.append(
+                    segment.url.replace(
+                        "https://multimedia.nt.qq.com.cn",
+                        "http://multimedia.nt.qq.com.cn",
+                    )
+                )
+        descriptions = iter(
+            await asyncio.gather(*(ImageDescriber.describe(url) for url in urls))
+        )
+        images = iter(urls)
         message = ""
         for segment in msg:
             if isinstance(segment, At):
                 message += f"@{segment.target} "
             elif isinstance(segment, Image):
-                assert segment.url is not None
-                url = segment.url.replace(
-                    "https://multimedia.nt.qq.com.cn", "http://multimedia.nt.qq.com.cn"
-                )
-                message += (
-                    f"\n![{await cls.__generate_image_description(url)}]\n({url})"
-                )
+                message += f"\n![{next(descriptions)}]\n({next(images)})"
             elif isinstance(segment, Text):
                 message += segment.text
         return message
@@ -345,38 +826,23 @@ class ChatManager:
         cls, msg: UniMsg, session: Session, bot: Bot
     ) -> str | None:
         gid = session.scene.id
-        if not (group_msg := GROUP_MSG_CACHE[gid]):
+        prompt = ImpersonationPrompt.of(gid)
+        await prompt.sync(gid)
+        if not prompt.pieces:
             return
 
-        content = "".join(
-            f"{msg.nickname} ({msg.uid})说:\n{msg.msg}\n\n" for msg in group_msg
-        )
         my_info = await bot.get_group_member_info(group_id=gid, user_id=session.self_id)
         my_name = my_info["card"] or my_info["nickname"]
-        head = f"你在一个QQ群里，你的QQ是`{session.self_id}`，你的名字是`{my_name}`。请你结合该群的聊天记录作出回应，要求表现得随性一点，需要参与讨论，混入其中。不要过分插科打诨，不要提起无关的话题，不知道说什么可以复读群友的话。不允许包含聊天记录的格式。如果觉得此时不需要自己说话，请只回复`<EMPTY>`。下面是群组的聊天记录：\n\n"  # noqa: E501
-        foot = (
-            "\n\n你的回复应该尽可能简练,一次只说一句话，像人类一样随意，不允许有emoji。"
-        )
-        soul = (
-            ChatConfig.get("SOUL")
-            if ChatConfig.get("IMPERSONATION_SOUL") is False
-            else ChatConfig.get("IMPERSONATION_SOUL")
-        )
+        soul = ChatConfig.get("IMPERSONATION_SOUL")
+        if soul is False:
+            soul = ChatConfig.get("SOUL")
+        messages = prompt.build(session.self_id, my_name, soul)
+        length, count = prompt.length, len(prompt.pieces)
+        ChatLog.debug(lambda: f"GROUP {gid} 伪人提示词长度: {length}, 消息数: {count}")
         result = await cls.get_zhipu_result(
             str(uuid.uuid4()),
             ChatConfig.get("IMPERSONATION_MODEL"),
-            [
-                {
-                    "role": "system",
-                    "content": (
-                        f"你需要遵循以下要求，同时保证回应中不包含聊天记录格式。{soul}"
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": head + content + foot,
-                },
-            ],
+            messages,
             session,
             True,
         )
@@ -387,9 +853,9 @@ class ChatManager:
         if ":" in result:
             result = result.split(":")[-1].strip("\n")
         if "<EMPTY>" in result:
-            logger.info("伪人不需要回复，已被跳过", "zhipu_toolkit", session=session)
+            ChatLog.info("伪人不需要回复，已被跳过", sample="skip", session=session)
             return
-        logger.info(f"伪人回复: {result}", "zhipu_toolkit", session=session)
+        ChatLog.info(lambda: f"伪人回复: {ChatLog.truncate(result)}", session=session)
         await cache_group_message(
             msg,
             session,
@@ -409,9 +875,10 @@ class ChatManager:
         messages: list,
         session: Session,
         impersonation: bool = False,
+        ban: bool = True,
     ) -> tuple[str, bool]:
         loop = asyncio.get_event_loop()
-        client = ZhipuAI(api_key=ChatConfig.get("API_KEY"))
+        client = get_zhipu_client()
         try:
             response = await loop.run_in_executor(
                 None,
@@ -431,9 +898,16 @@ class ChatManager:
                     session=session,
                 )
                 return await cls.get_zhipu_result(
-                    uid, model, messages, session, impersonation
+                    uid, model, messages, session, impersonation, ban
                 )
             elif "user" in error:
+                if not ban:
+                    logger.warning(
+                        f"UID {uid} 合并的提问触发内容审查: 无法确定提问者，不做封禁",
+                        "zhipu_toolkit",
+                        session=session,
+                    )
+                    return "输入内容包含不安全或敏感内容", False
                 if not impersonation:
                     logger.warning(
                         f"UID {uid} 用户输入内容触发内容审查: 封禁用户 {session.user.id} 5 分钟",  # noqa: E501
@@ -458,36 +932,281 @@ class ChatManager:
                 return "历史记录包含违规内已被清除，请重新开始对话", False
         return response.choices[0].message.content, True  # type: ignore
 
+
+class ImageDescriber:
+    """
+    图片描述。
+
+    `IMAGE_BATCH_WINDOW` 大于 0 时，在窗口内收集待描述的图片，
+    最多 `IMAGE_BATCH_SIZE` 张合并为一次多图请求，再将各图描述分发给等待者。
+    合并请求要求模型以 JSON 对象返回(`response_format`)，模型不支持时
+    记录该模型并改为仅靠提示词约束输出格式；批量结果解析失败时退回逐张请求。
+    """
+
+    BATCH_PROMPT = '依次描述这{count}张图片。只返回一个JSON对象，格式为{{"descriptions": [...]}}，descriptions是长度为{count}的字符串数组，第i项是第i张图片的描述，不要输出其他内容。'  # noqa: E501
+
+    json_unsupported: ClassVar[set[str]] = set()
+    """不支持 JSON 输出格式的图片理解模型"""
+
+    pending: ClassVar[list[tuple[str, asyncio.Future[str]]]] = []
+    _timer: ClassVar[asyncio.TimerHandle | None] = None
+    _tasks: ClassVar[set[asyncio.Task]] = set()
+
+    @classmethod
+    async def describe(cls, url: str) -> str:
+        """获取图片描述，失败时返回空字符串"""
+        window = ChatConfig.get("IMAGE_BATCH_WINDOW")
+        if window <= 0:
+            return await cls.describe_one(url)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        cls.pending.append((url, future))
+        if len(cls.pending) >= ChatConfig.get("IMAGE_BATCH_SIZE"):
+            cls.__flush()
+        elif cls._timer is None:
+            cls._timer = loop.call_later(window / 1000, cls.__flush)
+        return await future
+
     @classmethod
-    async def __generate_image_description(cls, url: str):
+    def __flush(cls) -> None:
+        if cls._timer is not None:
+            cls._timer.cancel()
+            cls._timer = None
+        batch, cls.pending = cls.pending, []
+        if batch:
+            task = asyncio.create_task(cls.__run(batch))
+            cls._tasks.add(task)
+            task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    async def __run(cls, batch: list[tuple[str, asyncio.Future[str]]]) -> None:
+        urls = [url for url, _ in batch]
+        results = None
+        if len(urls) > 1:
+            results = await cls.describe_many(urls)
+        if results is None:
+            results = await asyncio.gather(*(cls.describe_one(url) for url in urls))
+        try:
+            for (_, future), result in zip(batch, results, strict=True):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            # 结果数量与图片不符时 zip 抛出异常，不让等待者一直挂起
+            for _, future in batch:
+                if not future.done():
+                    future.set_result("")
+
+    @classmethod
+    async def __request(
+        cls, model: str, content: list[dict], json_format: bool = False
+    ) -> str:
         loop = asyncio.get_event_loop()
-        client = ZhipuAI(api_key=ChatConfig.get("API_KEY"))
+        client = get_zhipu_client()
+        response = await loop.run_in_executor(
+            None,
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": content}],
+                user_id=str(uuid.uuid4()),
+                response_format={"type": "json_object"} if json_format else None,
+            ),
+        )
+        result = response.choices[0].message.content  # type: ignore
+        if not isinstance(result, str):
+            raise ValueError(f"图片理解模型返回了非文本内容: {type(result).__name__}")
+        return result
+
+    @classmethod
+    async def __request_json(cls, model: str, content: list[dict]) -> str:
+        """以 JSON 输出格式请求，模型不支持时去掉该参数重试并记录"""
+        if model in cls.json_unsupported:
+            return await cls.__request(model, content)
         try:
-            response = await loop.run_in_executor(
-                None,
-                lambda: client.chat.completions.create(
-                    model=ChatConfig.get("IMAGE_UNDERSTANDING_MODEL"),
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {"type": "text", "text": "描述图片"},
-                                {
-                                    "type": "image_url",
-                                    "image_url": {"url": url},
-                                },
-                            ],
-                        }
-                    ],
-                    user_id=str(uuid.uuid4()),
-                ),
+            return await cls.__request(model, content, json_format=True)
+        except Exception as e:
+            error = e
+        # 去掉 response_format 后仍失败则不是格式不支持，直接抛出
+        result = await cls.__request(model, content)
+        cls.json_unsupported.add(model)
+        ChatLog.debug(f"模型 {model} 不支持 JSON 输出格式，改为仅靠提示词约束: {error}")
+        return result
+
+    @staticmethod
+    def parse_descriptions(result: str) -> list | None:
+        """
+        解析合并请求返回的 `{"descriptions": [...]}`。
+
+        不支持 JSON 输出格式的模型可能在对象外附带代码块标记等内容，
+        因此取第一个 `{` 至最后一个 `}` 之间的部分解析。
+
+        返回:
+        - 描述列表，格式不符时返回 None。
+        """
+        start, end = result.find("{"), result.rfind("}")
+        if start == -1 or end < start:
+            return None
+        try:
+            data = ujson.loads(result[start : end + 1])
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        descriptions = data.get("descriptions")
+        return descriptions if isinstance(descriptions, list) else None
+
+    @classmethod
+    async def describe_one(cls, url: str) -> str:
+        """单张图片请求"""
+        try:
+            result = await cls.__request(
+                ChatConfig.get("IMAGE_UNDERSTANDING_MODEL"),
+                [
+                    {"type": "text", "text": "描述图片"},
+                    {"type": "image_url", "image_url": {"url": url}},
+                ]
             )
-            result = response.choices[0].message.content  # type: ignore
         except Exception:
             result = ""
-        assert isinstance(result, str)
         return result.replace("\n", "\\n")
 
+    @classmethod
+    async def describe_many(cls, urls: list[str]) -> list[str] | None:
+        """
+        多张图片合并为一次请求。
+
+        返回:
+        - 与 `urls` 一一对应的描述，请求或解析失败时返回 None。
+        """
+        content: list[dict] = [
+            {"type": "text", "text": cls.BATCH_PROMPT.format(count=len(urls))}
+        ]
+        content.extend({"type": "image_url", "image_url": {"url": u}} for u in urls)
+        try:
+            result = await cls.__request_json(
+                ChatConfig.get("IMAGE_UNDERSTANDING_MODEL"), content
+            )
+        except Exception as e:
+            ChatLog.debug(f"批量图片描述失败，退回逐张请求: {e}")
+            return None
+        descriptions = cls.parse_descriptions(result)
+        if descriptions is None:
+            ChatLog.debug("批量图片描述格式不正确，退回逐张请求")
+            return None
+        if len(descriptions) != len(urls):
+            ChatLog.debug("批量图片描述数量不匹配，退回逐张请求")
+            return None
+        return [str(d).replace("\n", "\\n") for d in descriptions]
+
+
+class GroupRate:
+    """群消息速率与伪人触发统计"""
+
+    MIN_AGE = 1.0
+    """估计速率时的最短观测时间(秒)"""
+
+    def __init__(self) -> None:
+        self.rate = 0.0
+        """指数衰减的消息速率(条/秒)"""
+        self.first_seen = self.updated = time.monotonic()
+        self.probability = 0.0
+        """最近一次的触发概率"""
+        self.messages = 0
+        self.triggered = 0
+
+    def decay(self, now: float, window: float) -> float:
+        self.rate *= math.exp(-(now - self.updated) / window)
+        self.updated = now
+        return self.rate
+
+    def estimate(self, now: float, window: float) -> float:
+        """
+        估计消息速率(条/秒)。
+
+        衰减速率从 0 开始累积，观测时间不足一个窗口时偏低，
+        按 `1 - exp(-观测时间 / window)` 修正。
+        """
+        age = max(now - self.first_seen, self.MIN_AGE)
+        return self.decay(now, window) / -math.expm1(-age / window)
+
+
+class ImpersonationTrigger:
+    """
+    伪人模式触发决策。
+
+    `IMPERSONATION_ADAPTIVE` 关闭时按固定的 `IMPERSONATION_TRIGGER_FREQUENCY` 触发；
+    开启时为每个群维护指数衰减的消息速率，使每 `IMPERSONATION_WINDOW` 秒
+    约发言 `IMPERSONATION_TARGET` 次。`IMPERSONATION_GLOBAL_LIMIT` 大于 0 时，
+    所有群在一个窗口内的触发总数不超过该值。
+    """
+
+    groups: ClassVar[dict[str, GroupRate]] = {}
+    history: ClassVar[deque[float]] = deque()
+    """窗口内各群的触发时间"""
+
+    @classmethod
+    def __window(cls) -> float:
+        window = ChatConfig.get("IMPERSONATION_WINDOW")
+        if window <= 0:
+            raise ValueError("IMPERSONATION_WINDOW must be greater than 0")
+        return window
+
+    @classmethod
+    def should_trigger(cls, gid: str) -> bool:
+        """记录一条群消息，并决定是否触发伪人回复"""
+        now = time.monotonic()
+        window = cls.__window()
+        group = cls.groups.setdefault(gid, GroupRate())
+        group.decay(now, window)
+        group.rate += 1 / window
+        group.messages += 1
+
+        if ChatConfig.get("IMPERSONATION_ADAPTIVE") is True:
+            target = ChatConfig.get("IMPERSONATION_TARGET")
+            rate = group.estimate(now, window)
+            group.probability = min(1.0, target / (rate * window))
+        else:
+            group.probability = ChatConfig.get("IMPERSONATION_TRIGGER_FREQUENCY") / 100
+
+        while cls.history and now - cls.history[0] > window:
+            cls.history.popleft()
+        limit = ChatConfig.get("IMPERSONATION_GLOBAL_LIMIT")
+        if limit > 0 and len(cls.history) >= limit:
+            ChatLog.debug(
+                lambda: f"GROUP {gid} 伪人触发达到全局上限 {limit}，跳过",
+                sample="global_limit",
+            )
+            return False
+        if random.random() >= group.probability:
+            return False
+        cls.history.append(now)
+        group.triggered += 1
+        return True
+
+    @classmethod
+    def stats(cls) -> list[tuple[str, float, float, int, int]]:
+        """
+        各群的触发统计。
+
+        返回:
+        - (群号, 消息速率(条/分钟), 触发概率, 消息数, 触发数) 列表，按速率降序。
+        """
+        now = time.monotonic()
+        window = cls.__window()
+        return sorted(
+            (
+                (
+                    gid,
+                    g.estimate(now, window) * 60,
+                    g.probability,
+                    g.messages,
+                    g.triggered,
+                )
+                for gid, g in cls.groups.items()
+            ),
+            key=lambda x: x[1],
+            reverse=True,
+        )
+
 
 class ImpersonationStatus:
     @classmethod
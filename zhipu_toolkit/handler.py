@@ -1,10 +1,8 @@
 import asyncio
-import random
 import re
 
 from arclet.alconna import Alconna, AllParam, Args, CommandMeta
 from nonebot import get_driver, on_message, on_regex, require
-from zhipuai import ZhipuAI
 
 from zhenxun.services.log import logger
 from zhenxun.utils.rules import ensure_group
@@ -12,6 +10,8 @@ from zhenxun.utils.rules import ensure_group
 require("nonebot_plugin_alconna")
 from nonebot.adapters import Bot, Event
 from nonebot.permission import SUPERUSER
+from nonebot.rule import Rule
+from nonebot.typing import T_State
 from nonebot_plugin_alconna import Image, Match, Text, UniMessage, UniMsg, on_alconna
 from nonebot_plugin_uninfo import ADMIN, Session, UniSession
 
@@ -19,13 +19,17 @@ from .config import ChatConfig
 from .data_source import (
     ChatManager,
     ImpersonationStatus,
+    ImpersonationTrigger,
+    ReplySender,
     cache_group_message,
     check_task_status_periodically,
+    get_zhipu_client,
     hello,
-    split_text,
     submit_task_to_zhipuai,
 )
-from .rule import is_to_me
+from .lifecycle import Lifecycle
+from .log import ChatLog
+from .rule import PLAIN_TEXT_KEY, is_to_me
 
 driver = get_driver()
 
@@ -33,21 +37,24 @@ driver = get_driver()
 @driver.on_startup
 async def handle_connect():
     await ChatManager.initialize()
+    await Lifecycle.start()
 
 
 @driver.on_shutdown
 async def handle_disconnect():
-    await ChatManager.save()
+    await Lifecycle.shutdown()
 
 
 draw_pic = on_alconna(
     Alconna("生成图片", Args["msg?", AllParam], meta=CommandMeta(compact=True)),
+    rule=Lifecycle.is_accepting,
     priority=5,
     block=True,
 )
 
 draw_video = on_alconna(
     Alconna("生成视频", Args["message?", AllParam], meta=CommandMeta(compact=True)),
+    rule=Lifecycle.is_accepting,
     priority=5,
     block=True,
 )
@@ -59,9 +66,13 @@ byd_mode = on_regex(
     block=True,
 )
 
-normal_chat = on_message(rule=is_to_me, priority=998, block=True)
+normal_chat = on_message(
+    rule=Rule(is_to_me, Lifecycle.is_accepting), priority=998, block=True
+)
 
-byd_chat = on_message(rule=ensure_group, priority=999, block=False)
+byd_chat = on_message(
+    rule=Rule(ensure_group, Lifecycle.is_accepting), priority=999, block=False
+)
 
 clear_my_chat = on_alconna(Alconna("清理我的会话"), priority=5, block=True)
 
@@ -69,6 +80,10 @@ clear_all_chat = on_alconna(
     Alconna("清理全部会话"), permission=SUPERUSER, priority=5, block=True
 )
 
+byd_stats = on_alconna(
+    Alconna("伪人统计"), permission=SUPERUSER, priority=5, block=True
+)
+
 clear_group_chat = on_alconna(
     Alconna("清理群会话"),
     rule=ensure_group,
@@ -121,17 +136,20 @@ async def _(bot: Bot, event: Event, session: Session = UniSession()):
 
 
 @normal_chat.handle()
-async def _(msg: UniMsg, session: Session = UniSession()):
-    if msg.extract_plain_text() == "":
+async def _(msg: UniMsg, state: T_State, session: Session = UniSession()):
+    plain_text = state.get(PLAIN_TEXT_KEY)
+    if plain_text is None:
+        plain_text = msg.extract_plain_text()
+    if plain_text == "":
         result = await hello()
         await UniMessage([Text(result[0]), Image(path=result[1])]).finish(reply_to=True)
     if ChatConfig.get("API_KEY") == "":
         await UniMessage(Text("请先设置智谱AI的APIKEY!")).send(reply_to=True)
     else:
-        result = await ChatManager.normal_chat_result(msg, session)
-        for r, delay in await split_text(result):
-            await UniMessage(r).send()
-            await asyncio.sleep(delay)
+        async with Lifecycle.track():
+            result = await ChatManager.normal_chat_result(msg, session)
+            if result is not None:
+                await ReplySender.send(result, session)
 
 
 @byd_chat.handle()
@@ -140,12 +158,13 @@ async def _(msg: UniMsg, bot: Bot, session: Session = UniSession()):
         if ChatConfig.get("API_KEY") == "":
             return
         await cache_group_message(msg, session)
-        if random.random() * 100 < ChatConfig.get("IMPERSONATION_TRIGGER_FREQUENCY"):
-            result = await ChatManager.impersonation_result(msg, session, bot)
-            if result:
-                await UniMessage(result).send()
+        if ImpersonationTrigger.should_trigger(session.scene.id):
+            async with Lifecycle.track():
+                result = await ChatManager.impersonation_result(msg, session, bot)
+                if result:
+                    await UniMessage(result).send()
     else:
-        logger.debug("伪人模式被禁用.skip...", "zhipu_toolkit", session=session)
+        ChatLog.debug("伪人模式被禁用.skip...", sample="disabled", session=session)
 
 
 @clear_my_chat.handle()
@@ -165,6 +184,23 @@ async def _():
     )
 
 
+@byd_stats.handle()
+async def _():
+    stats = ImpersonationTrigger.stats()
+    if not stats:
+        await byd_stats.finish(Text("暂无伪人模式统计"), reply_to=True)
+    await byd_stats.send(
+        Text(
+            "\n".join(
+                f"群 {gid}: {rate:.1f} 条/分钟, 触发概率 {probability:.1%}, "
+                f"触发 {triggered}/{messages}"
+                for gid, rate, probability, messages, triggered in stats
+            )
+        ),
+        reply_to=True,
+    )
+
+
 @clear_group_chat.handle()
 async def _(session: Session = UniSession()):
     count = await ChatManager.clear_history(f"g-{session.scene.id}")
@@ -180,15 +216,16 @@ async def handle_check(msg: str):
         await draw_pic.send(Text("请先设置智谱AI的APIKEY!"), reply_to=True)
     else:
         try:
-            loop = asyncio.get_event_loop()
-            client = ZhipuAI(api_key=ChatConfig.get("API_KEY"))
-            response = await loop.run_in_executor(
-                None,
-                lambda: client.images.generations(
-                    model=ChatConfig.get("PIC_MODEL"), prompt=msg, size="1440x720"
-                ),
-            )
-            await draw_pic.send(Image(url=response.data[0].url), reply_to=True)
+            async with Lifecycle.track():
+                loop = asyncio.get_event_loop()
+                client = get_zhipu_client()
+                response = await loop.run_in_executor(
+                    None,
+                    lambda: client.images.generations(
+                        model=ChatConfig.get("PIC_MODEL"), prompt=msg, size="1440x720"
+                    ),
+                )
+                await draw_pic.send(Image(url=response.data[0].url), reply_to=True)
         except Exception as e:
             await draw_pic.send(Text(f"错了：{e}"), reply_to=True)
 
@@ -207,7 +244,7 @@ async def submit_task(msg: str):
                 await draw_video.send(
                     Text(f"任务已提交,id: {response.id}"), reply_to=True
                 )
-                asyncio.create_task(  # noqa: RUF006
+                Lifecycle.spawn(
                     check_task_status_periodically(response.id, draw_video)  # type: ignore
                 )
             else:
@@ -0,0 +1,110 @@
+import asyncio
+from collections.abc import AsyncIterator, Coroutine
+from contextlib import asynccontextmanager
+from typing import Any, ClassVar
+
+from zhenxun.services.log import logger
+
+from .config import ChatConfig
+from .data_source import ChatManager
+from .log import ChatLog
+
+
+class Lifecycle:
+    """
+    插件生命周期管理。
+
+    负责定时自动保存对话数据，并在关闭时停止接收新请求、
+    在限定时间内等待进行中的任务完成后再做最后一次保存。
+    """
+
+    accepting: ClassVar[bool] = True
+    """是否接收新请求"""
+    inflight: ClassVar[set[asyncio.Task]] = set()
+    """进行中的任务"""
+    _autosave_task: ClassVar[asyncio.Task | None] = None
+    _stopping: ClassVar[asyncio.Event | None] = None
+
+    @classmethod
+    async def start(cls) -> None:
+        """
+        启动定时自动保存，`AUTOSAVE_INTERVAL` 不大于 0 时不启用
+        """
+        cls.accepting = True
+        cls._stopping = asyncio.Event()
+        interval = ChatConfig.get("AUTOSAVE_INTERVAL")
+        if interval > 0:
+            cls._autosave_task = asyncio.create_task(cls.__autosave(interval))
+
+    @classmethod
+    async def __autosave(cls, interval: float) -> None:
+        # 只在等待间隔时响应停止，不在保存途中被取消
+        assert cls._stopping is not None
+        while True:
+            try:
+                await asyncio.wait_for(cls._stopping.wait(), interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if await ChatManager.save(only_dirty=True):
+                    logger.debug("自动保存对话数据完成", "zhipu_toolkit")
+            except Exception as e:
+                logger.error("自动保存对话数据失败", "zhipu_toolkit", e=e)
+
+    @classmethod
+    async def is_accepting(cls) -> bool:
+        """规则: 关闭过程中不再接收新请求"""
+        return cls.accepting
+
+    @classmethod
+    @asynccontextmanager
+    async def track(cls) -> AsyncIterator[None]:
+        """将当前任务登记为进行中，关闭时会等待其完成"""
+        task = asyncio.current_task()
+        if task is not None:
+            cls.inflight.add(task)
+        try:
+            yield
+        finally:
+            if task is not None:
+                cls.inflight.discard(task)
+
+    @classmethod
+    def spawn(cls, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """创建后台任务并登记为进行中"""
+        task = asyncio.create_task(coro)
+        cls.inflight.add(task)
+        task.add_done_callback(cls.inflight.discard)
+        return task
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        """
+        停止接收新请求，在 `SHUTDOWN_DRAIN_TIMEOUT` 秒内等待进行中的任务，
+        超时的任务将被取消，最后保存对话数据并写出剩余日志。
+        """
+        cls.accepting = False
+        if cls._stopping is not None:
+            cls._stopping.set()
+        if cls._autosave_task is not None:
+            await cls._autosave_task
+            cls._autosave_task = None
+
+        current = asyncio.current_task()
+        pending = {t for t in cls.inflight if t is not current and not t.done()}
+        if pending:
+            timeout = ChatConfig.get("SHUTDOWN_DRAIN_TIMEOUT")
+            logger.info(f"等待 {len(pending)} 个进行中的任务完成...", "zhipu_toolkit")
+            _, pending = await asyncio.wait(pending, timeout=timeout)
+            if pending:
+                logger.warning(
+                    f"{len(pending)} 个任务未在 {timeout} 秒内完成，已取消",
+                    "zhipu_toolkit",
+                )
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        await ChatManager.save()
+        await ChatManager.store.close()
+        await asyncio.to_thread(ChatLog.stop)
@@ -0,0 +1,143 @@
+from collections.abc import Callable
+import queue
+import threading
+from typing import Any, ClassVar
+
+from loguru import logger as loguru_logger
+from nonebot import get_driver
+
+from zhenxun.services.log import logger
+
+from .config import ChatConfig
+
+LogMessage = str | Callable[[], str]
+"""日志内容，可为延迟构建的函数"""
+
+
+class ChatLog:
+    """
+    插件热路径日志。
+
+    - 仅在日志等级启用时才构建日志内容。
+    - 问题与回答按 `LOG_MAX_LENGTH` 截断。
+    - 重复事件按 `LOG_SAMPLE_RATE` 采样。
+    - `ASYNC_LOG` 开启时，经有界队列交由后台线程写出，队列满时丢弃并计数。
+    """
+
+    QUEUE_SIZE = 1024
+
+    _queue: ClassVar[queue.Queue | None] = None
+    _worker: ClassVar[threading.Thread | None] = None
+    _samples: ClassVar[dict[str, int]] = {}
+    dropped: ClassVar[int] = 0
+    """因队列已满被丢弃的日志数量"""
+    _dropped_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def is_enabled(cls, level: str) -> bool:
+        """判断日志等级是否启用"""
+        min_level = get_driver().config.log_level
+        if isinstance(min_level, str):
+            min_level = loguru_logger.level(min_level.upper()).no
+        return loguru_logger.level(level.upper()).no >= min_level
+
+    @classmethod
+    def truncate(cls, text: str) -> str:
+        """按 `LOG_MAX_LENGTH` 截断文本，为 0 时不截断"""
+        limit = ChatConfig.get("LOG_MAX_LENGTH")
+        if limit <= 0 or len(text) <= limit:
+            return text
+        return f"{text[:limit]}...(共{len(text)}字)"
+
+    @classmethod
+    def __sampled(cls, key: str) -> bool:
+        rate = ChatConfig.get("LOG_SAMPLE_RATE")
+        if rate <= 1:
+            return True
+        count = cls._samples.get(key, 0)
+        cls._samples[key] = count + 1
+        return count % rate == 0
+
+    @classmethod
+    def log(
+        cls,
+        level: str,
+        message: LogMessage,
+        sample: str | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        记录日志。
+
+        参数:
+        - level: 日志等级，如 `debug`、`info`。
+        - message: 日志内容，传入函数时仅在需要写出时调用。`ASYNC_LOG` 开启时
+          函数在后台线程中调用，只能读取调用时已确定的值，不要读取可变对象。
+        - sample: 采样键，同一键的事件按 `LOG_SAMPLE_RATE` 采样。
+        - kwargs: 透传给 `zhenxun.services.log.logger`，如 `session`。
+        """
+        if not cls.is_enabled(level):
+            return
+        if sample is not None and not cls.__sampled(sample):
+            return
+        if not ChatConfig.get("ASYNC_LOG"):
+            cls.__write(level, message, kwargs)
+            return
+        cls.__ensure_worker()
+        assert cls._queue is not None
+        try:
+            cls._queue.put_nowait((level, message, kwargs))
+        except queue.Full:
+            with cls._dropped_lock:
+                cls.dropped += 1
+
+    @classmethod
+    def debug(cls, message: LogMessage, sample: str | None = None, **kwargs: Any):
+        cls.log("debug", message, sample, **kwargs)
+
+    @classmethod
+    def info(cls, message: LogMessage, sample: str | None = None, **kwargs: Any):
+        cls.log("info", message, sample, **kwargs)
+
+    @classmethod
+    def __write(cls, level: str, message: LogMessage, kwargs: dict) -> None:
+        if callable(message):
+            message = message()
+        getattr(logger, level)(message, "zhipu_toolkit", **kwargs)
+
+    @classmethod
+    def __ensure_worker(cls) -> None:
+        if cls._worker is not None and cls._worker.is_alive():
+            return
+        cls._queue = queue.Queue(maxsize=cls.QUEUE_SIZE)
+        cls._worker = threading.Thread(
+            target=cls.__run, name="zhipu_toolkit-log", daemon=True
+        )
+        cls._worker.start()
+
+    @classmethod
+    def __run(cls) -> None:
+        assert cls._queue is not None
+        while (item := cls._queue.get()) is not None:
+            try:
+                cls.__write(*item)
+            except Exception as e:
+                logger.error("写出日志失败", "zhipu_toolkit", e=e)
+            with cls._dropped_lock:
+                dropped, cls.dropped = cls.dropped, 0
+            if dropped:
+                logger.warning(
+                    f"日志队列已满，丢弃了 {dropped} 条日志", "zhipu_toolkit"
+                )
+
+    @classmethod
+    def stop(cls, timeout: float = 5) -> None:
+        """写出队列中剩余的日志并停止后台线程"""
+        if cls._worker is None or cls._queue is None:
+            return
+        try:
+            cls._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        cls._worker.join(timeout)
+        cls._worker = None
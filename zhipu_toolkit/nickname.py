@@ -0,0 +1,99 @@
+from collections.abc import Callable
+import re
+
+WORD_CHAR = re.compile(r"[0-9A-Za-z_]")
+
+
+def _is_word_char(char: str) -> bool:
+    return WORD_CHAR.fullmatch(char) is not None
+
+
+def _bounded(text: str, start: int, end: int) -> bool:
+    """
+    检查 `text[start:end]` 处的昵称两侧是否满足单词边界。
+
+    仅当昵称首(尾)字符为英文字母、数字或下划线时才检查其前(后)一个字符，
+    因此中文昵称与英文紧邻时仍能命中。
+    """
+    if _is_word_char(text[start]) and start > 0 and _is_word_char(text[start - 1]):
+        return False
+    return not (
+        _is_word_char(text[end - 1]) and end < len(text) and _is_word_char(text[end])
+    )
+
+
+def compile_nickname_pattern(
+    nicknames: list[str], word_boundary: bool = False
+) -> re.Pattern[str] | None:
+    """
+    将昵称列表编译为单个正则交替式。
+
+    参数:
+    - nicknames: 昵称列表。
+    - word_boundary: 是否要求昵称两侧不是英文字母、数字或下划线，
+      避免 `bot` 命中 `robot` 这类情况。只作用于昵称的英文首尾，
+      对中文昵称无影响。
+
+    返回:
+    - 编译后的正则，昵称列表为空时返回 None。
+    """
+    # 长昵称优先，保证交替式命中最长的别名
+    names = sorted({n for n in nicknames if n}, key=len, reverse=True)
+    if not names:
+        return None
+    if not word_boundary:
+        return re.compile("|".join(map(re.escape, names)))
+    alternatives = []
+    for name in names:
+        body = re.escape(name)
+        if _is_word_char(name[0]):
+            body = rf"(?<![0-9A-Za-z_]){body}"
+        if _is_word_char(name[-1]):
+            body = rf"{body}(?![0-9A-Za-z_])"
+        alternatives.append(body)
+    return re.compile("|".join(alternatives))
+
+
+def compile_nickname_matcher(
+    nicknames: list[str], word_boundary: bool = False
+) -> Callable[[str], bool]:
+    """
+    构建昵称匹配函数。
+
+    开启单词边界时，边界断言会让正则失去字面量前缀优化，
+    因此先用无边界的正则查找，再按命中的昵称检查两侧的字符。
+    校验失败时还会检查同一位置更短的昵称，再从下一个字符继续查找，
+    结果与 `compile_nickname_pattern` 的带边界正则一致。
+
+    参数:
+    - nicknames: 昵称列表。
+    - word_boundary: 同 `compile_nickname_pattern`。
+
+    返回:
+    - 判断文本是否包含昵称的函数。
+    """
+    plain = compile_nickname_pattern(nicknames)
+    if plain is None:
+        return lambda text: False
+    if not word_boundary:
+        return lambda text: plain.search(text) is not None
+
+    names = {n for n in nicknames if n}
+    # 交替式在同一位置只返回最长的昵称，记录每个昵称的更短前缀昵称
+    prefixes = {
+        name: [p for p in names if len(p) < len(name) and name.startswith(p)]
+        for name in names
+    }
+
+    def match(text: str) -> bool:
+        pos = 0
+        while (m := plain.search(text, pos)) is not None:
+            start, end = m.span()
+            if _bounded(text, start, end) or any(
+                _bounded(text, start, start + len(p)) for p in prefixes[m.group()]
+            ):
+                return True
+            pos = start + 1
+        return False
+
+    return match
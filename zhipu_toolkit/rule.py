@@ -1,11 +1,40 @@
+from collections.abc import Callable
+from typing import ClassVar
+
 from nonebot.adapters import Event
+from nonebot.typing import T_State
+
+from .config import ChatConfig, plugin_config
+from .nickname import compile_nickname_matcher
+
+PLAIN_TEXT_KEY = "_zhipu_toolkit_plain_text"
+"""is_to_me 提取的纯文本在 state 中的键，供下游 handler 复用"""
+
+
+class NicknameMatcher:
+    """
+    昵称触发匹配器。
+
+    昵称来自启动时解析的驱动配置，只会变化的是 `NICKNAME_WORD_BOUNDARY`，
+    该配置变化时重新编译。
+    """
+
+    nicknames: ClassVar[list[str]] = plugin_config.nickname
+    _matcher: ClassVar[Callable[[str], bool] | None] = None
+    _word_boundary: ClassVar[bool | None] = None
 
-from .config import nicknames
+    @classmethod
+    def match(cls, text: str) -> bool:
+        word_boundary = ChatConfig.get("NICKNAME_WORD_BOUNDARY") is True
+        if cls._matcher is None or word_boundary is not cls._word_boundary:
+            cls._matcher = compile_nickname_matcher(cls.nicknames, word_boundary)
+            cls._word_boundary = word_boundary
+        return cls._matcher(text)
 
 
-async def is_to_me(event: Event) -> bool:
+async def is_to_me(event: Event, state: T_State) -> bool:
     msg = event.get_message().extract_plain_text()
-    for nickname in nicknames:
-        if nickname in msg:
-            return True
+    state[PLAIN_TEXT_KEY] = msg
+    if NicknameMatcher.match(msg):
+        return True
     return event.is_tome()
@@ -0,0 +1,258 @@
+from abc import ABC, abstractmethod
+from typing import Any
+
+import ujson
+
+
+class SessionStore(ABC):
+    """
+    会话存储抽象。
+
+    以列表保存对话历史与群消息环形缓冲，每个键带有版本号，
+    任何修改都会使版本号递增，用于乐观并发控制。
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> list[dict]:
+        """获取键对应的列表，不存在时返回空列表"""
+
+    @abstractmethod
+    async def get_versioned(self, key: str) -> tuple[list[dict], int]:
+        """获取键对应的列表及其版本号"""
+
+    @abstractmethod
+    async def version(self, key: str) -> int:
+        """获取键的版本号，不存在时为0"""
+
+    @abstractmethod
+    async def length_versioned(self, key: str) -> tuple[int, int]:
+        """获取键对应列表的长度及其版本号，不读取列表内容"""
+
+    @abstractmethod
+    async def append(self, key: str, *items: dict, maxlen: int | None = None) -> int:
+        """
+        原子地追加元素，并在给定 `maxlen` 时裁剪为最新的 `maxlen` 个元素。
+
+        返回:
+        - 修改后的版本号。
+        """
+
+    @abstractmethod
+    async def compare_and_set(self, key: str, items: list[dict], version: int) -> bool:
+        """
+        仅当版本号仍为 `version` 时以 `items` 覆盖键，否则放弃。
+
+        返回:
+        - 是否写入成功。
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> int:
+        """删除键，返回被删除列表的长度"""
+
+    @abstractmethod
+    async def clear(self, prefix: str) -> int:
+        """删除指定前缀的所有键，返回删除的键数量"""
+
+    async def close(self) -> None:
+        """释放连接等资源"""
+
+
+class MemoryStore(SessionStore):
+    """进程内存储"""
+
+    def __init__(self) -> None:
+        self.data: dict[str, list[dict]] = {}
+        self.versions: dict[str, int] = {}
+
+    def __bump(self, key: str) -> int:
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return self.versions[key]
+
+    async def get(self, key: str) -> list[dict]:
+        return list(self.data.get(key, []))
+
+    async def get_versioned(self, key: str) -> tuple[list[dict], int]:
+        return list(self.data.get(key, [])), self.versions.get(key, 0)
+
+    async def version(self, key: str) -> int:
+        return self.versions.get(key, 0)
+
+    async def length_versioned(self, key: str) -> tuple[int, int]:
+        return len(self.data.get(key, [])), self.versions.get(key, 0)
+
+    async def append(self, key: str, *items: dict, maxlen: int | None = None) -> int:
+        values = self.data.setdefault(key, [])
+        values.extend(items)
+        if maxlen is not None and len(values) > maxlen:
+            del values[:-maxlen]
+        return self.__bump(key)
+
+    async def compare_and_set(self, key: str, items: list[dict], version: int) -> bool:
+        if self.versions.get(key, 0) != version:
+            return False
+        self.data[key] = list(items)
+        self.__bump(key)
+        return True
+
+    async def delete(self, key: str) -> int:
+        if key not in self.data:
+            return 0
+        self.__bump(key)
+        return len(self.data.pop(key))
+
+    async def clear(self, prefix: str) -> int:
+        keys = [key for key in self.data if key.startswith(prefix)]
+        for key in keys:
+            await self.delete(key)
+        return len(keys)
+
+    def dump(self, prefix: str) -> dict[str, list[dict]]:
+        """导出指定前缀的数据，键中不含前缀"""
+        return {
+            key.removeprefix(prefix): values
+            for key, values in self.data.items()
+            if key.startswith(prefix)
+        }
+
+    def load(self, prefix: str, data: dict[str, list[dict]]) -> None:
+        """以 `dump` 的格式导入数据"""
+        for key, values in data.items():
+            self.data[prefix + key] = values
+            self.__bump(prefix + key)
+
+
+class RedisStore(SessionStore):
+    """
+    Redis 协议存储，供多进程/多实例共享会话。
+
+    列表以 JSON 字符串保存在 Redis list 中，版本号保存在 `<key>:version`，
+    追加与裁剪在同一事务中完成，覆盖写通过 WATCH 实现乐观并发。
+    """
+
+    def __init__(self, client: Any, namespace: str = "zhipu_toolkit:") -> None:
+        """
+        参数:
+        - client: `decode_responses=True` 的 `redis.asyncio.Redis` 或兼容客户端。
+        - namespace: 键前缀。
+        """
+        self.client = client
+        self.namespace = namespace
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisStore":
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise ImportError(
+                "SESSION_STORE 为 'redis' 时需要安装 redis: poetry add redis"
+            ) from e
+        return cls(aioredis.from_url(url, decode_responses=True))
+
+    def __key(self, key: str) -> str:
+        return self.namespace + key
+
+    def __version_key(self, key: str) -> str:
+        return f"{self.namespace}{key}:version"
+
+    async def get(self, key: str) -> list[dict]:
+        values = await self.client.lrange(self.__key(key), 0, -1)
+        return [ujson.loads(v) for v in values]
+
+    async def get_versioned(self, key: str) -> tuple[list[dict], int]:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.lrange(self.__key(key), 0, -1)
+            pipe.get(self.__version_key(key))
+            values, version = await pipe.execute()
+        return [ujson.loads(v) for v in values], int(version or 0)
+
+    async def version(self, key: str) -> int:
+        return int(await self.client.get(self.__version_key(key)) or 0)
+
+    async def length_versioned(self, key: str) -> tuple[int, int]:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.llen(self.__key(key))
+            pipe.get(self.__version_key(key))
+            length, version = await pipe.execute()
+        return int(length), int(version or 0)
+
+    async def append(self, key: str, *items: dict, maxlen: int | None = None) -> int:
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(
+                self.__key(key), *(ujson.dumps(i, ensure_ascii=False) for i in items)
+            )
+            if maxlen is not None:
+                pipe.ltrim(self.__key(key), -maxlen, -1)
+            pipe.incr(self.__version_key(key))
+            result = await pipe.execute()
+        return int(result[-1])
+
+    async def compare_and_set(self, key: str, items: list[dict], version: int) -> bool:
+        from redis.exceptions import WatchError
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.__version_key(key))
+                if int(await pipe.get(self.__version_key(key)) or 0) != version:
+                    return False
+                pipe.multi()
+                pipe.delete(self.__key(key))
+                if items:
+                    pipe.rpush(
+                        self.__key(key),
+                        *(ujson.dumps(i, ensure_ascii=False) for i in items),
+                    )
+                pipe.incr(self.__version_key(key))
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def delete(self, key: str) -> int:
+        from redis.exceptions import WatchError
+
+        # 与 MemoryStore 一致，键不存在时不递增版本号
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(self.__key(key))
+                    count = int(await pipe.llen(self.__key(key)))
+                    if count == 0:
+                        await pipe.unwatch()
+                        return 0
+                    pipe.multi()
+                    pipe.delete(self.__key(key))
+                    pipe.incr(self.__version_key(key))
+                    await pipe.execute()
+                    return count
+                except WatchError:
+                    continue
+
+    async def clear(self, prefix: str) -> int:
+        count = 0
+        async for key in self.client.scan_iter(match=f"{self.__key(prefix)}*"):
+            if key.endswith(":version"):
+                continue
+            await self.delete(key.removeprefix(self.namespace))
+            count += 1
+        return count
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_store(kind: str, url: str) -> SessionStore:
+    """
+    创建会话存储。
+
+    参数:
+    - kind: 存储类型，即 `SESSION_STORE` 配置。
+    - url: Redis 地址，即 `REDIS_URL` 配置。
+    """
+    match kind:
+        case "memory":
+            return MemoryStore()
+        case "redis":
+            return RedisStore.from_url(url)
+        case _:
+            raise ValueError("SESSION_STORE must be 'memory' or 'redis'")